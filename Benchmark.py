@@ -0,0 +1,93 @@
+import json
+import os
+import platform
+import random
+import subprocess
+from time import perf_counter, strftime
+
+import numpy as np
+
+from Environment import Rotation, RubiksCube, TrackedRubiksCube, BatchedRubiksCube, clear_sequence_cache
+
+SCRAMBLE_LENGTH = 20
+BATCH_SIZE = 100000
+
+
+# Calls operation repeatedly in batches of count until at least seconds have passed and returns the calls per second
+def measure(operation, count, seconds):
+    calls = 0
+    elapsed = 0.0
+    while elapsed < seconds:
+        start = perf_counter()
+        for _ in range(count):
+            operation()
+        elapsed += perf_counter() - start
+        calls += count
+    return calls / elapsed
+
+
+# Throughput of the cube operations, as a dict of operations per second keyed by benchmark name
+def run_benchmarks(seconds=0.2):
+    results = {}
+    rng = random.Random(0)
+    cube = RubiksCube()
+
+    for r in Rotation:
+        results['moves_per_second.rotate.' + r.name] = measure(lambda: cube.rotate(r), 10000, seconds)
+        method = getattr(cube, 'rotate_' + r.name.lower())
+        results['moves_per_second.rotate_' + r.name.lower()] = measure(method, 10000, seconds)
+    tracked = TrackedRubiksCube()
+    results['moves_per_second.tracked_rotate'] = measure(lambda: tracked.rotate(Rotation.UP), 10000, seconds)
+
+    scramble = [rng.choice(list(Rotation)) for _ in range(SCRAMBLE_LENGTH)]
+    scrambles = [[rng.choice(list(Rotation)) for _ in range(SCRAMBLE_LENGTH)] for _ in range(1000)]
+
+    def scramble_by_moves():
+        for r in scramble:
+            cube.rotate(r)
+
+    def scramble_uncached():
+        clear_sequence_cache()
+        cube.rotate_sequence(rng.choice(scrambles))
+
+    results['scrambles_per_second.moves'] = measure(scramble_by_moves, 1000, seconds)
+    results['scrambles_per_second.sequence_cached'] = measure(lambda: cube.rotate_sequence(scramble), 10000, seconds)
+    results['scrambles_per_second.sequence_uncached'] = measure(scramble_uncached, 100, seconds)
+
+    batch = BatchedRubiksCube(BATCH_SIZE)
+    actions = np.random.default_rng(0).integers(len(Rotation), size=BATCH_SIZE)
+    results['moves_per_second.batched'] = measure(lambda: batch.rotate(actions), 1, seconds) * BATCH_SIZE
+
+    state = cube.state()
+    states = {state}
+    results['states_per_second.copy'] = measure(cube.copy, 10000, seconds)
+    results['states_per_second.state'] = measure(cube.state, 10000, seconds)
+    results['states_per_second.hash'] = measure(lambda: hash(state), 10000, seconds)
+    results['states_per_second.lookup'] = measure(lambda: state in states, 10000, seconds)
+    results['states_per_second.squares'] = measure(lambda: cube.squares, 10000, seconds)
+    return results
+
+
+# Metadata identifying the run, so results of different commits can be compared
+def run_info():
+    try:
+        # Run from the repository holding this file, wherever the benchmark is started from
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'time': strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'machine': platform.machine()}
+
+
+def main(output=None, seconds=0.2):
+    results = run_benchmarks(seconds)
+    for name, value in results.items():
+        print("{0:45} {1:15,.0f}".format(name, value))
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump({'info': run_info(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
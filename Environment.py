@@ -1,4 +1,9 @@
+import argparse
 from enum import Enum
+from functools import lru_cache
+from operator import itemgetter
+
+import numpy as np
 
 
 # Colors of a Rubik's Cube
@@ -23,7 +28,216 @@ class Rotation(Enum):
     RIGHT_PRIME = 7
 
 
+# Quarter turns written as sticker cycles over the 54 bitboard positions (see RubiksCube for the layout): within
+# each cycle the sticker at a position moves to the next position, and the last one wraps around to the first
+_QUARTER_TURN_CYCLES = {
+    Rotation.UP: ((6, 33, 24, 15), (7, 34, 25, 16), (8, 35, 26, 17), (36, 38, 44, 42), (37, 41, 43, 39)),
+    Rotation.LEFT: ((2, 47, 24, 38), (5, 50, 21, 41), (8, 53, 18, 44), (27, 29, 35, 33), (28, 32, 34, 30)),
+    Rotation.FRONT: ((0, 2, 8, 6), (1, 5, 7, 3), (11, 53, 33, 36), (14, 52, 30, 37), (17, 51, 27, 38)),
+    Rotation.RIGHT: ((0, 36, 26, 45), (3, 39, 23, 48), (6, 42, 20, 51), (9, 11, 17, 15), (10, 14, 16, 12)),
+}
+
+# A prime rotation is its base quarter turn applied three times
+_PRIME_OF = {
+    Rotation.UP_PRIME: Rotation.UP,
+    Rotation.LEFT_PRIME: Rotation.LEFT,
+    Rotation.FRONT_PRIME: Rotation.FRONT,
+    Rotation.RIGHT_PRIME: Rotation.RIGHT,
+}
+
+
+# Returns the permutation moving every sticker one step along the given cycles, as a tuple where entry i is the
+# position whose sticker ends up at position i
+def _cycles_to_permutation(cycles):
+    permutation = list(range(54))
+    for cycle in cycles:
+        for i in range(len(cycle)):
+            permutation[cycle[(i + 1) % len(cycle)]] = cycle[i]
+    return tuple(permutation)
+
+
+# Returns the permutation equivalent to applying first and then second
+def compose_permutations(first, second):
+    return tuple(first[i] for i in second)
+
+
+def _compile_move_table():
+    table = {}
+    for r, cycles in _QUARTER_TURN_CYCLES.items():
+        table[r] = _cycles_to_permutation(cycles)
+    for r, base in _PRIME_OF.items():
+        table[r] = compose_permutations(compose_permutations(table[base], table[base]), table[base])
+    return table
+
+
+# Permutation of every Rotation, indexed by rotation, computed once at import time
+MOVE_TABLE = _compile_move_table()
+# One getter per rotation indexed by rotation value; applying a move to a sticker tuple is a single call
+MOVE_GETTERS = tuple(itemgetter(*MOVE_TABLE[r]) for r in Rotation)
+
+
+# Face f holds positions 9f to 9f + 8 and is solved when they all match its center, which never moves and has color
+# value f. A rotation only changes the matches of a face at the positions receiving a sticker from another face, 3 on
+# each of its 4 side faces; the turned face merely permutes its own stickers. Returns those side faces with a getter of
+# their 3 positions.
+def _side_positions(permutation):
+    sides = []
+    for f in range(len(Color)):
+        positions = [p for p in range(f * 9, f * 9 + 9) if permutation[p] // 9 != f]
+        if positions:
+            sides.append((f, itemgetter(*positions)))
+    return tuple(sides)
+
+
+# Side faces and positions of every rotation, indexed by rotation value
+_SIDE_POSITIONS = tuple(_side_positions(MOVE_TABLE[r]) for r in Rotation)
+
+# Base quarter turn and prime of every rotation, used to merge consecutive turns of the same face
+_BASE_OF = {r: _PRIME_OF.get(r, r) for r in Rotation}
+_PRIME_OF_BASE = {base: prime for prime, base in _PRIME_OF.items()}
+
+# Maximum number of compiled rotation sequences kept in the LRU cache
+SEQUENCE_CACHE_SIZE = 4096
+
+
+# Simplifies a sequence of rotations: a move followed by its prime cancels, four turns of the same face vanish and three
+# become its prime. Consecutive turns of one face are merged, so the result never holds more than two of them in a row.
+def simplify_rotations(rotations):
+    # Stack of [base rotation, number of quarter turns modulo 4]
+    turns = []
+    for r in rotations:
+        base = _BASE_OF[r]
+        count = 1 if base is r else 3
+        if turns and turns[-1][0] is base:
+            turns[-1][1] = (turns[-1][1] + count) % 4
+            if turns[-1][1] == 0:
+                turns.pop()
+        else:
+            turns.append([base, count])
+
+    simplified = []
+    for base, count in turns:
+        if count == 3:
+            simplified.append(_PRIME_OF_BASE[base])
+        else:
+            simplified.extend([base] * count)
+    return simplified
+
+
+# Rotations indexed by value, to turn sequence keys back into rotations
+_ROTATIONS = tuple(Rotation)
+
+
+# Key of a sequence of rotations: the bytes of their values, which hash in C unlike a tuple of Rotation. The value is
+# read from _value_ directly as the value property of Enum is several times slower.
+def rotation_key(rotations):
+    return bytes([r._value_ for r in rotations])
+
+
+# Returns a single getter applying a whole sequence of rotations to a sticker tuple. Results are kept in a bounded LRU
+# cache keyed on rotation_key, so frequently used scrambles and macros are compiled once.
+def compile_rotations(rotations):
+    return compile_rotation_key(rotation_key(rotations))
+
+
+# Getter of the sequence given by a rotation_key. On a miss the sequence is simplified and compiled through a second
+# cache keyed on the simplified sequence, so sequences that simplify alike share one permutation.
+@lru_cache(maxsize=SEQUENCE_CACHE_SIZE)
+def compile_rotation_key(key):
+    return _compile_simplified(rotation_key(simplify_rotations(_ROTATIONS[v] for v in key)))
+
+
+@lru_cache(maxsize=SEQUENCE_CACHE_SIZE)
+def _compile_simplified(key):
+    return itemgetter(*sequence_permutation(_ROTATIONS[v] for v in key))
+
+
+def clear_sequence_cache():
+    compile_rotation_key.cache_clear()
+    _compile_simplified.cache_clear()
+
+
+# Returns the permutation equivalent to applying the rotations in order
+def sequence_permutation(rotations):
+    permutation = tuple(range(54))
+    for r in rotations:
+        permutation = compose_permutations(permutation, MOVE_TABLE[r])
+    return permutation
+
+
+# Translation tables turning a sticker key into the ASCII binary digits of one color's bitboard, indexed by color value
+_BITBOARD_DIGITS = tuple(bytes.maketrans(bytes(range(len(Color))), bytes(b'1'[0] if i == c.value else b'0'[0]
+                                                                          for i in range(len(Color))))
+                         for c in Color)
+# Translation table turning ASCII binary digits into bytes of value 0 and 1
+_DIGIT_BYTES = bytes.maketrans(b'01', bytes((0, 1)))
+
+
+# Converts the six color bitboards into a tuple of 54 color values indexed by bitboard position
+def stickers_from_squares(squares):
+    # Each bitboard becomes a number with one byte per position, holding 1 where the color is; as colors never overlap,
+    # scaling by the color value and summing gives one byte per position holding its color
+    packed = 0
+    for c in Color:
+        digits = format(squares[c.value], '054b').encode().translate(_DIGIT_BYTES)
+        packed += c.value * int.from_bytes(digits, 'big')
+    return tuple(packed.to_bytes(54, 'little'))
+
+
+# Converts a tuple (or bytes) of 54 color values back into a tuple of the six color bitboards
+def squares_from_stickers(stickers):
+    key = bytes(stickers)
+    return tuple(int(key.translate(digits)[::-1], 2) for digits in _BITBOARD_DIGITS)
+
+
+# Immutable, hashable snapshot of a cube, packed as 54 bytes of color values indexed by bitboard position. Meant as the
+# key of transposition tables, visited sets and caches: the hash is computed once and equality is a single compare.
+class CubeState:
+    __slots__ = ('key', '_hash')
+
+    def __init__(self, key):
+        object.__setattr__(self, 'key', bytes(key))
+        object.__setattr__(self, '_hash', hash(self.key))
+
+    @classmethod
+    def from_stickers(cls, stickers):
+        return cls(stickers)
+
+    @classmethod
+    def from_squares(cls, squares):
+        return cls(stickers_from_squares(squares))
+
+    @property
+    def stickers(self):
+        return tuple(self.key)
+
+    @property
+    def squares(self):
+        return squares_from_stickers(self.key)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CubeState is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CubeState is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, CubeState):
+            return NotImplemented
+        return self._hash == other._hash and self.key == other.key
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return CubeState, (self.key,)
+
+    def __repr__(self):
+        return "CubeState({0!r})".format(self.key)
+
+
 class RubiksCube:
+    __slots__ = ('stickers',)
 
     # Initializes a Rubik's Cube to its default configuration
     def __init__(self):
@@ -34,261 +248,187 @@ class RubiksCube:
         # For bitboard reasons, assume by default you are facing the red side, and the rest of the sides are accessed by
         # turning the cube horizontally; the top (yellow) is accessed by turning the cube down; the bottom (white) is
         # accessed by turning the cube up.
-        self.squares = default_rubiks_cube()
+        # Internally the cube is stored as stickers: a tuple of 54 color values indexed by the same bit positions, so a
+        # move is a single lookup through its precomputed permutation. The bitboards are derived on demand as a tuple,
+        # so changing a single bitboard in place fails; assign all six to squares instead.
+        self.stickers = DEFAULT_STICKERS
+
+    @property
+    def squares(self):
+        return squares_from_stickers(self.stickers)
+
+    @squares.setter
+    def squares(self, squares):
+        self.stickers = stickers_from_squares(squares)
+
+    # Returns a new cube in the same configuration; the sticker tuple is immutable so it is shared, not copied
+    def copy(self):
+        cube = RubiksCube.__new__(RubiksCube)
+        cube.stickers = self.stickers
+        return cube
+
+    # Returns the hashable CubeState of the current configuration
+    def state(self):
+        return CubeState(self.stickers)
+
+    # Sets the cube to the configuration of a CubeState
+    def set_state(self, state):
+        self.stickers = state.stickers
+
+    # Applies any Rotation with one table lookup, primes cost the same as base turns
+    def rotate(self, rotation):
+        self.stickers = MOVE_GETTERS[rotation.value](self.stickers)
+
+    # Applies a whole sequence of rotations in one step through its compiled, cached permutation
+    def rotate_sequence(self, rotations):
+        self.stickers = compile_rotation_key(rotation_key(rotations))(self.stickers)
 
     def rotate_up(self):
-        bitmask_sides = 0b111000000111000000111000000111000000
-        # Standard 9 side rotation
-        bitmask_top_left_2 = 0b000100001000000000000000000000000000000000000
-        bitmask_top_left_4 = 0b000000010000000000000000000000000000000000000
-        bitmask_top_left_6 = 0b000000100000000000000000000000000000000000000
-        bitmask_top_right_2 = 0b100001000000000000000000000000000000000000000
-        bitmask_top_right_6 = 0b001000000000000000000000000000000000000000000
-        bitmask_top_right_4 = 0b010000000000000000000000000000000000000000000
-        erase_overflow = 0b111111111111111111111111111111111111
-
-        for c in Color:
-            # Find the bits on the bitmask
-            extracted_bits_sides = self.squares[c.value] & bitmask_sides
-            extracted_bits_top_left_2 = self.squares[c.value] & bitmask_top_left_2
-            extracted_bits_top_left_4 = self.squares[c.value] & bitmask_top_left_4
-            extracted_bits_top_left_6 = self.squares[c.value] & bitmask_top_left_6
-            extracted_bits_top_right_2 = self.squares[c.value] & bitmask_top_right_2
-            extracted_bits_top_right_6 = self.squares[c.value] & bitmask_top_right_6
-            extracted_bits_top_right_4 = self.squares[c.value] & bitmask_top_right_4
-            # Remove the bits on the bitmask
-            self.squares[c.value] ^= extracted_bits_sides | extracted_bits_top_left_2 | extracted_bits_top_left_4 \
-                                                          | extracted_bits_top_left_6 | extracted_bits_top_right_2 \
-                                                          | extracted_bits_top_right_6 | extracted_bits_top_right_4
-            # Perform the rotation
-            self.squares[c.value] ^= (extracted_bits_sides << 27 | extracted_bits_sides >> 9) & erase_overflow
-            self.squares[c.value] ^= extracted_bits_top_left_2 << 2 | extracted_bits_top_left_4 << 4 \
-                                                                    | extracted_bits_top_left_6 << 6 \
-                                                                    | extracted_bits_top_right_2 >> 2 \
-                                                                    | extracted_bits_top_right_6 >> 6 \
-                                                                    | extracted_bits_top_right_4 >> 4
+        self.rotate(Rotation.UP)
 
     def rotate_up_prime(self):
-        self.rotate_up()
-        self.rotate_up()
-        self.rotate_up()
+        self.rotate(Rotation.UP_PRIME)
 
     def rotate_left(self):
-        bitmask_front_left_45 = 0b100100100
-        bitmask_top_right_36 = 0b100100100000000000000000000000000000000000000
-        bitmask_back_left_14 = 0b001000000000000000000000000
-        bitmask_back_left_20 = 0b000001000000000000000000000
-        bitmask_back_left_26 = 0b000000001000000000000000000
-        bitmask_bottom_right_23 = 0b000000100000000000000000000000000000000000000000000000
-        bitmask_bottom_right_29 = 0b000100000000000000000000000000000000000000000000000000
-        bitmask_bottom_right_35 = 0b100000000000000000000000000000000000000000000000000000
-        # Standard 9 side rotation
-        bitmask_left_left_2 = 0b000100001000000000000000000000000000
-        bitmask_left_left_4 = 0b000000010000000000000000000000000000
-        bitmask_left_left_6 = 0b000000100000000000000000000000000000
-        bitmask_left_right_2 = 0b100001000000000000000000000000000000
-        bitmask_left_right_6 = 0b001000000000000000000000000000000000
-        bitmask_left_right_4 = 0b010000000000000000000000000000000000
-
-        for c in Color:
-            # Find the bits on the bitmask
-            extracted_bits_front_left_45 = self.squares[c.value] & bitmask_front_left_45
-            extracted_bits_top_right_36 = self.squares[c.value] & bitmask_top_right_36
-            extracted_bits_back_left_14 = self.squares[c.value] & bitmask_back_left_14
-            extracted_bits_back_left_20 = self.squares[c.value] & bitmask_back_left_20
-            extracted_bits_back_left_26 = self.squares[c.value] & bitmask_back_left_26
-            extracted_bits_bottom_right_23 = self.squares[c.value] & bitmask_bottom_right_23
-            extracted_bits_bottom_right_29 = self.squares[c.value] & bitmask_bottom_right_29
-            extracted_bits_bottom_right_35 = self.squares[c.value] & bitmask_bottom_right_35
-            extracted_bits_left_left_2 = self.squares[c.value] & bitmask_left_left_2
-            extracted_bits_left_left_4 = self.squares[c.value] & bitmask_left_left_4
-            extracted_bits_left_left_6 = self.squares[c.value] & bitmask_left_left_6
-            extracted_bits_left_right_2 = self.squares[c.value] & bitmask_left_right_2
-            extracted_bits_left_right_6 = self.squares[c.value] & bitmask_left_right_6
-            extracted_bits_left_right_4 = self.squares[c.value] & bitmask_left_right_4
-            # Remove the bits on the bitmask
-            self.squares[c.value] ^= extracted_bits_front_left_45 | extracted_bits_top_right_36 \
-                                                                  | extracted_bits_back_left_14 \
-                                                                  | extracted_bits_back_left_20 \
-                                                                  | extracted_bits_back_left_26 \
-                                                                  | extracted_bits_bottom_right_23 \
-                                                                  | extracted_bits_bottom_right_29 \
-                                                                  | extracted_bits_bottom_right_35 \
-                                                                  | extracted_bits_left_left_2 \
-                                                                  | extracted_bits_left_left_4 \
-                                                                  | extracted_bits_left_left_6 \
-                                                                  | extracted_bits_left_right_2 \
-                                                                  | extracted_bits_left_right_6 \
-                                                                  | extracted_bits_left_right_4
-            # Perform the rotation
-            self.squares[c.value] ^= extracted_bits_front_left_45 << 45 | extracted_bits_top_right_36 >> 36 \
-                                                                        | extracted_bits_back_left_14 << 14 \
-                                                                        | extracted_bits_back_left_20 << 20 \
-                                                                        | extracted_bits_back_left_26 << 26 \
-                                                                        | extracted_bits_bottom_right_23 >> 23 \
-                                                                        | extracted_bits_bottom_right_29 >> 29 \
-                                                                        | extracted_bits_bottom_right_35 >> 35 \
-                                                                        | extracted_bits_left_left_2 << 2 \
-                                                                        | extracted_bits_left_left_4 << 4 \
-                                                                        | extracted_bits_left_left_6 << 6 \
-                                                                        | extracted_bits_left_right_2 >> 2 \
-                                                                        | extracted_bits_left_right_6 >> 6 \
-                                                                        | extracted_bits_left_right_4 >> 4
+        self.rotate(Rotation.LEFT)
 
     def rotate_left_prime(self):
-        self.rotate_left()
-        self.rotate_left()
-        self.rotate_left()
+        self.rotate(Rotation.LEFT_PRIME)
 
     def rotate_front(self):
-        bitmask_right_left_42 = 0b100000000000
-        bitmask_right_left_38 = 0b100000000000000
-        bitmask_right_left_34 = 0b100000000000000000
-        bitmask_top_right_21 = 0b100000000000000000000000000000000000000
-        bitmask_top_right_23 = 0b10000000000000000000000000000000000000
-        bitmask_top_right_25 = 0b1000000000000000000000000000000000000
-        bitmask_left_left_3 = 0b1000000000000000000000000000000000
-        bitmask_left_left_7 = 0b1000000000000000000000000000000
-        bitmask_left_left_11 = 0b1000000000000000000000000000
-        bitmask_bottom_right_20 = 0b100000000000000000000000000000000000000000000000000000
-        bitmask_bottom_right_22 = 0b10000000000000000000000000000000000000000000000000000
-        bitmask_bottom_right_24 = 0b1000000000000000000000000000000000000000000000000000
-        # Standard 9 side rotation
-        bitmask_front_left_2 = 0b000100001
-        bitmask_front_left_4 = 0b000000010
-        bitmask_front_left_6 = 0b000000100
-        bitmask_front_right_2 = 0b100001000
-        bitmask_front_right_6 = 0b001000000
-        bitmask_front_right_4 = 0b010000000
-
-        for c in Color:
-            # Find the bits on the bitmask
-            extracted_bits_right_left_42 = self.squares[c.value] & bitmask_right_left_42
-            extracted_bits_right_left_38 = self.squares[c.value] & bitmask_right_left_38
-            extracted_bits_right_left_34 = self.squares[c.value] & bitmask_right_left_34
-            extracted_bits_top_right_21 = self.squares[c.value] & bitmask_top_right_21
-            extracted_bits_top_right_23 = self.squares[c.value] & bitmask_top_right_23
-            extracted_bits_top_right_25 = self.squares[c.value] & bitmask_top_right_25
-            extracted_bits_left_left_3 = self.squares[c.value] & bitmask_left_left_3
-            extracted_bits_left_left_7 = self.squares[c.value] & bitmask_left_left_7
-            extracted_bits_left_left_11 = self.squares[c.value] & bitmask_left_left_11
-            extracted_bits_bottom_right_20 = self.squares[c.value] & bitmask_bottom_right_20
-            extracted_bits_bottom_right_22 = self.squares[c.value] & bitmask_bottom_right_22
-            extracted_bits_bottom_right_24 = self.squares[c.value] & bitmask_bottom_right_24
-            extracted_bits_front_left_2 = self.squares[c.value] & bitmask_front_left_2
-            extracted_bits_front_left_4 = self.squares[c.value] & bitmask_front_left_4
-            extracted_bits_front_left_6 = self.squares[c.value] & bitmask_front_left_6
-            extracted_bits_front_right_2 = self.squares[c.value] & bitmask_front_right_2
-            extracted_bits_front_right_6 = self.squares[c.value] & bitmask_front_right_6
-            extracted_bits_front_right_4 = self.squares[c.value] & bitmask_front_right_4
-            # Remove the bits on the bitmask
-            self.squares[c.value] ^= extracted_bits_right_left_42 | extracted_bits_right_left_38 \
-                                                                  | extracted_bits_right_left_34 \
-                                                                  | extracted_bits_top_right_21 \
-                                                                  | extracted_bits_top_right_23 \
-                                                                  | extracted_bits_top_right_25 \
-                                                                  | extracted_bits_left_left_3 \
-                                                                  | extracted_bits_left_left_7 \
-                                                                  | extracted_bits_left_left_11 \
-                                                                  | extracted_bits_bottom_right_20 \
-                                                                  | extracted_bits_bottom_right_22 \
-                                                                  | extracted_bits_bottom_right_24 \
-                                                                  | extracted_bits_front_left_2 \
-                                                                  | extracted_bits_front_left_4 \
-                                                                  | extracted_bits_front_left_6 \
-                                                                  | extracted_bits_front_right_2 \
-                                                                  | extracted_bits_front_right_6 \
-                                                                  | extracted_bits_front_right_4
-            # Perform the rotation
-            self.squares[c.value] ^= extracted_bits_right_left_42 << 42 | extracted_bits_right_left_38 << 38 \
-                                                                        | extracted_bits_right_left_34 << 34 \
-                                                                        | extracted_bits_top_right_21 >> 21 \
-                                                                        | extracted_bits_top_right_23 >> 23 \
-                                                                        | extracted_bits_top_right_25 >> 25 \
-                                                                        | extracted_bits_left_left_3 << 3 \
-                                                                        | extracted_bits_left_left_7 << 7 \
-                                                                        | extracted_bits_left_left_11 << 11 \
-                                                                        | extracted_bits_bottom_right_20 >> 20 \
-                                                                        | extracted_bits_bottom_right_22 >> 22 \
-                                                                        | extracted_bits_bottom_right_24 >> 24 \
-                                                                        | extracted_bits_front_left_2 << 2 \
-                                                                        | extracted_bits_front_left_4 << 4 \
-                                                                        | extracted_bits_front_left_6 << 6 \
-                                                                        | extracted_bits_front_right_2 >> 2 \
-                                                                        | extracted_bits_front_right_6 >> 6 \
-                                                                        | extracted_bits_front_right_4 >> 4
+        self.rotate(Rotation.FRONT)
 
     def rotate_front_prime(self):
-        self.rotate_front()
-        self.rotate_front()
-        self.rotate_front()
+        self.rotate(Rotation.FRONT_PRIME)
 
     def rotate_right(self):
-        bitmask_front_left_36 = 0b001001001
-        bitmask_back_left_31 = 0b100000000000000000000
-        bitmask_back_left_25 = 0b100000000000000000000000
-        bitmask_back_left_19 = 0b100000000000000000000000000
-        bitmask_top_right_10 = 0b1000000000000000000000000000000000000
-        bitmask_top_right_16 = 0b1000000000000000000000000000000000000000
-        bitmask_top_right_22 = 0b1000000000000000000000000000000000000000000
-        bitmask_bottom_right_45 = 0b001001001000000000000000000000000000000000000000000000
-        # Standard 9 side rotation
-        bitmask_right_left_2 = 0b000100001000000000
-        bitmask_right_left_4 = 0b000000010000000000
-        bitmask_right_left_6 = 0b000000100000000000
-        bitmask_right_right_2 = 0b100001000000000000
-        bitmask_right_right_6 = 0b001000000000000000
-        bitmask_right_right_4 = 0b010000000000000000
-
-        for c in Color:
-            # Find the bits on the bitmask
-            extracted_bits_front_left_36 = self.squares[c.value] & bitmask_front_left_36
-            extracted_bits_back_left_31 = self.squares[c.value] & bitmask_back_left_31
-            extracted_bits_back_left_25 = self.squares[c.value] & bitmask_back_left_25
-            extracted_bits_back_left_19 = self.squares[c.value] & bitmask_back_left_19
-            extracted_bits_top_right_10 = self.squares[c.value] & bitmask_top_right_10
-            extracted_bits_top_right_16 = self.squares[c.value] & bitmask_top_right_16
-            extracted_bits_top_right_22 = self.squares[c.value] & bitmask_top_right_22
-            extracted_bits_bottom_right_45 = self.squares[c.value] & bitmask_bottom_right_45
-            extracted_bits_right_left_2 = self.squares[c.value] & bitmask_right_left_2
-            extracted_bits_right_left_4 = self.squares[c.value] & bitmask_right_left_4
-            extracted_bits_right_left_6 = self.squares[c.value] & bitmask_right_left_6
-            extracted_bits_right_right_2 = self.squares[c.value] & bitmask_right_right_2
-            extracted_bits_right_right_6 = self.squares[c.value] & bitmask_right_right_6
-            extracted_bits_right_right_4 = self.squares[c.value] & bitmask_right_right_4
-            # Remove the bits on the bitmask
-            self.squares[c.value] ^= extracted_bits_front_left_36 | extracted_bits_back_left_31 \
-                                                                  | extracted_bits_back_left_25 \
-                                                                  | extracted_bits_back_left_19 \
-                                                                  | extracted_bits_top_right_10 \
-                                                                  | extracted_bits_top_right_16 \
-                                                                  | extracted_bits_top_right_22 \
-                                                                  | extracted_bits_bottom_right_45 \
-                                                                  | extracted_bits_right_left_2 \
-                                                                  | extracted_bits_right_left_4 \
-                                                                  | extracted_bits_right_left_6 \
-                                                                  | extracted_bits_right_right_2 \
-                                                                  | extracted_bits_right_right_6 \
-                                                                  | extracted_bits_right_right_4
-            # Perform the rotation
-            self.squares[c.value] ^= extracted_bits_front_left_36 << 36 | extracted_bits_back_left_31 << 31 \
-                                                                        | extracted_bits_back_left_25 << 25 \
-                                                                        | extracted_bits_back_left_19 << 19 \
-                                                                        | extracted_bits_top_right_10 >> 10 \
-                                                                        | extracted_bits_top_right_16 >> 16 \
-                                                                        | extracted_bits_top_right_22 >> 22 \
-                                                                        | extracted_bits_bottom_right_45 >> 45 \
-                                                                        | extracted_bits_right_left_2 << 2 \
-                                                                        | extracted_bits_right_left_4 << 4 \
-                                                                        | extracted_bits_right_left_6 << 6 \
-                                                                        | extracted_bits_right_right_2 >> 2 \
-                                                                        | extracted_bits_right_right_6 >> 6 \
-                                                                        | extracted_bits_right_right_4 >> 4
+        self.rotate(Rotation.RIGHT)
 
     def rotate_right_prime(self):
-        self.rotate_right()
-        self.rotate_right()
-        self.rotate_right()
+        self.rotate(Rotation.RIGHT_PRIME)
+
+    def is_solved(self):
+        return self.stickers == DEFAULT_STICKERS
+
+    # Number of stickers matching the center on every face, indexed by color value
+    def face_matches(self):
+        stickers = self.stickers
+        return tuple(stickers[f * 9:f * 9 + 9].count(f) for f in range(len(Color)))
+
+    # Features for a value network: the fraction of matching stickers on every face followed by 1 when solved
+    def features(self):
+        matches = self.face_matches()
+        return np.array([m / 9 for m in matches] + [float(sum(matches) == 54)], dtype=np.float32)
+
+
+# RubiksCube keeping its face matches up to date as it is turned: a rotation only compares the 12 stickers it moves
+# onto other faces, and is_solved is a sum of the counts. Assigning stickers directly or applying a sequence is also
+# supported, the counts are then recomputed in full on the next query.
+class TrackedRubiksCube(RubiksCube):
+    __slots__ = ('_matches', '_counted')
+
+    def __init__(self):
+        super().__init__()
+        self._recount()
+
+    def _recount(self):
+        self._matches = list(RubiksCube.face_matches(self))
+        self._counted = self.stickers
+
+    def copy(self):
+        cube = TrackedRubiksCube.__new__(TrackedRubiksCube)
+        cube.stickers = self.stickers
+        cube._matches = self._matches[:]
+        cube._counted = self._counted
+        return cube
+
+    def rotate(self, rotation):
+        old = self.stickers
+        up_to_date = self._counted is old
+        stickers = self.stickers = MOVE_GETTERS[rotation.value](old)
+        if up_to_date:
+            matches = self._matches
+            for f, side in _SIDE_POSITIONS[rotation.value]:
+                matches[f] += side(stickers).count(f) - side(old).count(f)
+            self._counted = stickers
+
+    def is_solved(self):
+        if self._counted is not self.stickers:
+            self._recount()
+        return sum(self._matches) == 54
+
+    def face_matches(self):
+        if self._counted is not self.stickers:
+            self._recount()
+        return tuple(self._matches)
+
+
+# Holds N cube states as one contiguous (N, 54) array of sticker colors, stepped together with vectorized indexing
+class BatchedRubiksCube:
+
+    # Initializes n Rubik's Cubes to their default configuration
+    def __init__(self, n):
+        self.stickers = np.empty((n, 54), dtype=np.uint8)
+        self.reset()
+
+    def __len__(self):
+        return len(self.stickers)
+
+    # Resets every cube, or only the cubes selected by a boolean mask or index array, to the default configuration
+    def reset(self, which=None):
+        if which is None:
+            self.stickers[:] = _DEFAULT_STICKERS_ARRAY
+        else:
+            self.stickers[which] = _DEFAULT_STICKERS_ARRAY
+
+    # Applies one rotation per cube; actions is a sequence of Rotation or an integer array of rotation values. When a
+    # boolean mask or index array is given, only the selected cubes are turned, one action per selected cube. Cubes are
+    # turned in place, one group per rotation, so views of stickers stay valid and no (N, 54) index is built.
+    def rotate(self, actions, which=None):
+        values = rotation_values(actions)
+        if which is not None:
+            which = np.asarray(which)
+            rows = np.flatnonzero(which) if which.dtype == bool else which
+        for r in range(len(Rotation)):
+            selected = values == r
+            if which is not None:
+                selected = rows[selected]
+            self.stickers[selected] = self.stickers[selected][:, _MOVE_ARRAY[r]]
+
+    # Boolean array telling which cubes are in the default configuration
+    def is_solved(self):
+        return (self.stickers == _DEFAULT_STICKERS_ARRAY).all(axis=1)
+
+    # (N, 6) array of the number of stickers matching the center on every face
+    def face_matches(self):
+        faces = self.stickers.reshape(len(self.stickers), len(Color), 9)
+        return (faces == np.arange(len(Color), dtype=np.uint8)[:, None]).sum(axis=2)
+
+    # Returns a RubiksCube holding a copy of the i-th cube
+    def cube(self, i):
+        cube = RubiksCube()
+        cube.stickers = tuple(self.stickers[i].tolist())
+        return cube
+
+    # Overwrites the i-th cube with the state of a RubiksCube
+    def set_cube(self, i, cube):
+        self.stickers[i] = cube.stickers
+
+
+# Converts a sequence or array of Rotation or rotation values into an integer array of rotation values, integer arrays
+# being passed through. Raises ValueError for anything else, as a value naming no Rotation would be silently skipped by
+# the vectorized moves.
+def rotation_values(actions):
+    if isinstance(actions, np.ndarray) and actions.dtype != object:
+        values = actions
+    else:
+        values = np.fromiter((a.value if isinstance(a, Rotation) else a for a in actions), dtype=np.intp,
+                             count=len(actions))
+    if not np.issubdtype(values.dtype, np.integer):
+        raise ValueError("actions must be Rotation or rotation values, not {0}".format(values.dtype))
+    if len(values) and (values.min() < 0 or values.max() >= len(Rotation)):
+        raise ValueError("actions must be rotation values from 0 to {0}".format(len(Rotation) - 1))
+    return values
 
 
 def default_rubiks_cube():
@@ -300,35 +440,63 @@ def default_rubiks_cube():
     return squares
 
 
-cube = RubiksCube()
-for co in Color:
-    print("{0:b}".format(cube.squares[co.value]))
-
-cube.rotate_left()
-cube.rotate_up()
-cube.rotate_up()
-cube.rotate_right()
-cube.rotate_front()
-cube.rotate_left_prime()
-cube.rotate_up_prime()
-cube.rotate_right_prime()
-cube.rotate_up_prime()
-cube.rotate_left_prime()
-cube.rotate_front_prime()
-
-cube.rotate_front()
-cube.rotate_left()
-cube.rotate_up()
-cube.rotate_right()
-cube.rotate_up()
-cube.rotate_left()
-cube.rotate_front_prime()
-cube.rotate_right_prime()
-cube.rotate_up_prime()
-cube.rotate_up_prime()
-cube.rotate_left_prime()
-
-print('\n')
-for co in Color:
-    print("{0:b}".format(cube.squares[co.value]))
+DEFAULT_STICKERS = stickers_from_squares(default_rubiks_cube())
+_DEFAULT_STICKERS_ARRAY = np.array(DEFAULT_STICKERS, dtype=np.uint8)
+# Permutations of every rotation stacked by rotation value, for moving many cubes at once
+_MOVE_ARRAY = np.array([MOVE_TABLE[r] for r in Rotation], dtype=np.intp)
+
+
+# Prints the bitboards of a cube before and after a sequence of rotations
+def demo():
+    cube = RubiksCube()
+    for co in Color:
+        print("{0:b}".format(cube.squares[co.value]))
+
+    cube.rotate_left()
+    cube.rotate_up()
+    cube.rotate_up()
+    cube.rotate_right()
+    cube.rotate_front()
+    cube.rotate_left_prime()
+    cube.rotate_up_prime()
+    cube.rotate_right_prime()
+    cube.rotate_up_prime()
+    cube.rotate_left_prime()
+    cube.rotate_front_prime()
+
+    cube.rotate_front()
+    cube.rotate_left()
+    cube.rotate_up()
+    cube.rotate_right()
+    cube.rotate_up()
+    cube.rotate_left()
+    cube.rotate_front_prime()
+    cube.rotate_right_prime()
+    cube.rotate_up_prime()
+    cube.rotate_up_prime()
+    cube.rotate_left_prime()
+
+    print('\n')
+    for co in Color:
+        print("{0:b}".format(cube.squares[co.value]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rubik's Cube environment")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('demo', help="print the bitboards before and after a sequence of rotations")
+    bench = commands.add_parser('bench', help="measure the throughput of the cube operations")
+    bench.add_argument('--output', help="write the results as JSON to this file")
+    bench.add_argument('--seconds', type=float, default=0.2, help="minimum time spent measuring each operation")
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        # Imported here as Benchmark itself imports this module
+        import Benchmark
+        Benchmark.main(args.output, args.seconds)
+    else:
+        demo()
+
 
+if __name__ == '__main__':
+    main()
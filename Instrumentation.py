@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from time import perf_counter
+
+from Environment import RubiksCube, TrackedRubiksCube
+
+# Methods counted when instrumentation is enabled. rotate_up and the other named rotations go through rotate, so their
+# time includes the time counted for rotate.
+INSTRUMENTED_METHODS = ('rotate', 'rotate_sequence',
+                        'rotate_up', 'rotate_up_prime', 'rotate_left', 'rotate_left_prime',
+                        'rotate_front', 'rotate_front_prime', 'rotate_right', 'rotate_right_prime')
+
+# Original methods while instrumentation is enabled, keyed by (class, method name)
+_originals = {}
+# Number of calls and cumulative seconds, keyed by 'Class.method'
+_stats = {}
+
+
+def _timed(method, stats):
+    def timed(*args):
+        start = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            stats[0] += 1
+            stats[1] += perf_counter() - start
+    timed.__name__ = method.__name__
+    timed.__doc__ = method.__doc__
+    return timed
+
+
+# Replaces the rotation methods of the cube classes with wrappers counting calls and time. Nothing is wrapped while
+# disabled, so instrumentation costs nothing unless turned on; counts are not locked and may be slightly off when
+# several threads turn cubes at once.
+def enable_instrumentation():
+    if _originals:
+        return
+    for cls in (RubiksCube, TrackedRubiksCube):
+        for name in INSTRUMENTED_METHODS:
+            if name in cls.__dict__:
+                original = cls.__dict__[name]
+                _originals[cls, name] = original
+                setattr(cls, name, _timed(original, _stats.setdefault(cls.__name__ + '.' + name, [0, 0.0])))
+
+
+# Restores the original methods, keeping the counts gathered so far
+def disable_instrumentation():
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+def reset_instrumentation():
+    for stats in _stats.values():
+        stats[0] = 0
+        stats[1] = 0.0
+
+
+# Calls and cumulative seconds of every instrumented method called so far
+def instrumentation_report():
+    return {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in _stats.items() if calls}
+
+
+# Enables instrumentation for the duration of a with block. When it was already enabled, by enable_instrumentation or an
+# enclosing block, it is left enabled on exit.
+@contextmanager
+def instrumented():
+    if _originals:
+        yield
+        return
+    enable_instrumentation()
+    try:
+        yield
+    finally:
+        disable_instrumentation()
@@ -0,0 +1,194 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from math import sqrt
+from time import perf_counter
+
+import numpy as np
+
+from Environment import Color, Rotation, MOVE_GETTERS, DEFAULT_STICKERS
+
+# Value backed up when a path reaches the solved cube
+SOLVED_VALUE = 1.0
+
+
+# Value and policy callback for testing and as a baseline: the fraction of stickers matching their face center, and
+# uniform priors. Takes an (N, 54) array of stickers and returns values of shape (N,) and priors of shape (N, 8).
+def face_match_evaluator(stickers):
+    faces = stickers.reshape(len(stickers), len(Color), 9)
+    values = (faces == np.arange(len(Color), dtype=np.uint8)[:, None]).mean(axis=(1, 2))
+    return values, np.full((len(stickers), len(Rotation)), 1 / len(Rotation))
+
+
+# Statistics of the edges leaving one state, indexed by rotation value. virtual counts the descents currently going
+# through an edge and not yet backed up.
+class _Node:
+    __slots__ = ('priors', 'visits', 'totals', 'virtual')
+
+    def __init__(self, priors):
+        self.priors = priors
+        self.visits = [0] * len(Rotation)
+        self.totals = [0.0] * len(Rotation)
+        self.virtual = [0] * len(Rotation)
+
+
+class MCTSResult:
+
+    def __init__(self, action, visits, values, solution, simulations, evaluations, seconds):
+        # Most visited rotation at the root, with the visits and mean values of every rotation by rotation value
+        self.action = action
+        self.visits = visits
+        self.values = values
+        # Shortest path to the solved cube met during the search, or None
+        self.solution = solution
+        self.simulations = simulations
+        self.evaluations = evaluations
+        self.seconds = seconds
+
+    def __repr__(self):
+        return "MCTSResult(action={0}, solution={1}, simulations={2}, evaluations={3}, seconds={4:.3f})".format(
+            self.action, self.solution, self.simulations, self.evaluations, self.seconds)
+
+
+# Monte Carlo tree search over the Rotation actions with PUCT selection. Worker threads each gather a batch of leaves,
+# hand them to evaluate in a single call and back the results up. Statistics live in a transposition table keyed on
+# the bytes of the stickers shared by every worker, so positions reached by different move orders are merged, and
+# descents in flight add a virtual loss to the edges they take so concurrent workers spread over different lines. The
+# evaluate callback runs outside the table lock, so a network or NumPy evaluation releasing the GIL overlaps the other
+# workers.
+class MCTS:
+
+    def __init__(self, evaluate=face_match_evaluator, num_workers=4, batch_size=16, c_puct=1.5, virtual_loss=1.0,
+                 discount=0.99, max_depth=30):
+        self.evaluate = evaluate
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.discount = discount
+        self.max_depth = max_depth
+        self.table = {}
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._evaluations = 0
+        self._solution = None
+
+    # Forgets every position of the transposition table
+    def clear(self):
+        self.table = {}
+
+    # Runs the given number of simulations from a RubiksCube and returns the resulting MCTSResult
+    def search(self, cube, simulations):
+        start = perf_counter()
+        root = cube.stickers
+        root_key = bytes(root)
+        self._remaining = simulations
+        self._evaluations = 0
+        self._solution = [] if root == DEFAULT_STICKERS else None
+        if self._solution is None:
+            if root_key not in self.table:
+                values, priors = self.evaluate(np.array([root], dtype=np.uint8))
+                self.table[root_key] = _Node(list(map(float, priors[0])))
+                self._evaluations += 1
+            with ThreadPoolExecutor(self.num_workers) as pool:
+                for future in [pool.submit(self._work, root) for _ in range(self.num_workers)]:
+                    future.result()
+
+        node = self.table.get(root_key)
+        visits = node.visits[:] if node is not None else [0] * len(Rotation)
+        totals = node.totals if node is not None else [0.0] * len(Rotation)
+        values = [t / n if n else 0.0 for t, n in zip(totals, visits)]
+        action = Rotation(max(range(len(Rotation)), key=visits.__getitem__))
+        solution = None if self._solution is None else [Rotation(a) for a in self._solution]
+        return MCTSResult(action, visits, values, solution, simulations - max(self._remaining, 0), self._evaluations,
+                          perf_counter() - start)
+
+    def _work(self, root):
+        while True:
+            with self._lock:
+                if self._remaining <= 0:
+                    return
+                count = min(self.batch_size, self._remaining)
+                self._remaining -= count
+                leaves = self._select_leaves(root, count)
+            if not leaves:
+                continue
+            states = list(leaves)
+            try:
+                values, priors = self.evaluate(np.array(states, dtype=np.uint8))
+                with self._lock:
+                    self._evaluations += 1
+                    for stickers, value, prior in zip(states, values, priors):
+                        value = float(value)
+                        key = bytes(stickers)
+                        if key not in self.table:
+                            self.table[key] = _Node(list(map(float, prior)))
+                        for path in leaves.pop(stickers):
+                            self._backup(path, value)
+                    if leaves:
+                        raise ValueError("evaluate returned fewer results than states")
+            except BaseException:
+                # The table outlives the search, so descents that were not backed up must not keep their virtual loss
+                with self._lock:
+                    for paths in leaves.values():
+                        for path in paths:
+                            self._undo_virtual_loss(path)
+                raise
+
+    # Descends count times from the root, returning the unexpanded states reached mapped to the paths leading there.
+    # Descents reaching the solved cube are backed up at once. Must be called holding the lock.
+    def _select_leaves(self, root, count):
+        leaves = {}
+        moves = MOVE_GETTERS
+        for _ in range(count):
+            stickers = root
+            path = []
+            last = None
+            for _ in range(self.max_depth):
+                node = self.table.get(bytes(stickers))
+                if node is None:
+                    break
+                action = self._choose(node, last)
+                node.virtual[action] += 1
+                path.append((node, action))
+                stickers = moves[action](stickers)
+                last = action
+                if stickers == DEFAULT_STICKERS:
+                    break
+            if stickers == DEFAULT_STICKERS:
+                if self._solution is None or len(path) < len(self._solution):
+                    self._solution = [action for _, action in path]
+                self._backup(path, SOLVED_VALUE)
+            else:
+                leaves.setdefault(stickers, []).append(path)
+        return leaves
+
+    # PUCT choice among the rotations of a node, never undoing the rotation just applied
+    def _choose(self, node, last):
+        visits = node.visits
+        virtual = node.virtual
+        scale = self.c_puct * sqrt(sum(visits) + sum(virtual) + 1)
+        undo = None if last is None else last ^ 1
+        best = None
+        best_score = None
+        for a in range(len(Rotation)):
+            if a == undo:
+                continue
+            n = visits[a] + virtual[a]
+            q = (node.totals[a] - virtual[a] * self.virtual_loss) / n if n else 0.0
+            score = q + scale * node.priors[a] / (1 + n)
+            if best_score is None or score > best_score:
+                best = a
+                best_score = score
+        return best
+
+    # Removes the virtual loss along a path and adds the value, discounted once per rotation from the leaf
+    def _backup(self, path, value):
+        for node, action in reversed(path):
+            value *= self.discount
+            node.virtual[action] -= 1
+            node.visits[action] += 1
+            node.totals[action] += value
+
+    def _undo_virtual_loss(self, path):
+        for node, action in path:
+            node.virtual[action] -= 1
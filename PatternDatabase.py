@@ -0,0 +1,265 @@
+import os
+from itertools import permutations
+from math import perm
+from operator import itemgetter
+from multiprocessing import Pool
+
+import numpy as np
+
+from Environment import Rotation, MOVE_TABLE, DEFAULT_STICKERS
+
+# Sticker positions moved by at least one Rotation
+_MOVED_POSITIONS = frozenset(p for r in Rotation for p in range(54) if MOVE_TABLE[r][p] != p)
+
+
+# Slots a piece can leave. The Rotation moves never turn the two faces sharing one edge, so that edge never moves and
+# ranking over its slot would only add entries no search can reach.
+def _moving_slots(slots):
+    return tuple(slot for slot in slots if slot[0] in _MOVED_POSITIONS)
+
+
+# Sticker positions of every corner and edge piece the Rotation moves, one tuple per slot, in the bitboard layout of
+# RubiksCube. The first position of a slot holds the reference sticker of the piece that belongs there when the cube is
+# solved.
+CORNER_SLOTS = _moving_slots(((0, 11, 51), (2, 27, 53), (6, 17, 36), (8, 33, 38),
+                              (9, 20, 45), (15, 26, 42), (18, 29, 47), (24, 35, 44)))
+EDGE_SLOTS = _moving_slots(((1, 52), (3, 14), (5, 30), (7, 37), (10, 48), (12, 23),
+                            (16, 39), (19, 46), (21, 32), (25, 43), (28, 50), (34, 41)))
+
+# Entries are stored 4 bits each; distances are clamped to MAX_DISTANCE so they stay admissible, and UNKNOWN marks
+# abstract states that were never reached by the search
+MAX_DISTANCE = 14
+UNKNOWN = 15
+
+# Depth marker of unvisited entries in the byte-per-entry table used while building
+_UNSEEN = 255
+# Number of table entries scanned per frontier expansion task
+BUILD_CHUNK = 1 << 20
+
+
+# Abstraction of the cube keeping only where a subset of its pieces are and how they are twisted. Each tracked piece is
+# described by the slot it occupies and which sticker of the slot holds its reference sticker; the index is the rank of
+# the slots taken (a partial permutation) times the number of orientations, plus the orientations in base 2 or 3.
+class PieceAbstraction:
+
+    def __init__(self, slots, pieces):
+        self.slots = slots
+        self.pieces = tuple(pieces)
+        self.orientations = len(slots[0])
+        n = len(slots)
+        k = len(self.pieces)
+        self.size = perm(n, k) * self.orientations ** k
+        # Weight of the i-th Lehmer digit of the partial permutation rank
+        self._rank_weights = tuple(perm(n - 1 - i, k - 1 - i) for i in range(k))
+
+        # Facelets numbered slot by slot, so facelet f lies in slot f // orientations
+        facelets = [p for slot in slots for p in slot]
+        facelet_of_position = {p: f for f, p in enumerate(facelets)}
+        # Facelet each facelet moves to under every rotation, indexed by rotation value
+        moves = []
+        for r in Rotation:
+            destination = {source: target for target, source in enumerate(MOVE_TABLE[r])}
+            moves.append([facelet_of_position[destination[p]] for p in facelets])
+        self.move_tables = np.array(moves, dtype=np.int64)
+
+        # Maps the colors read from a slot to the piece sitting there and which of its stickers holds the reference
+        # color: as flat tables keyed by the colors in base 6 for batches, and for single cubes as a dict from the
+        # colors of a tracked piece to what it adds to the index (see index)
+        self._piece_table = np.full(6 ** self.orientations, -1, dtype=np.int64)
+        self._twist_table = np.full(6 ** self.orientations, -1, dtype=np.int64)
+        self._tracked_colors = {}
+        tracked = {piece: i for i, piece in enumerate(self.pieces)}
+        for piece, slot in enumerate(slots):
+            colors = tuple(DEFAULT_STICKERS[p] for p in slot)
+            for arrangement in permutations(colors):
+                twist = arrangement.index(colors[0])
+                key = sum(c * 6 ** i for i, c in enumerate(arrangement))
+                self._piece_table[key] = piece
+                self._twist_table[key] = twist
+                if piece in tracked:
+                    i = tracked[piece]
+                    self._tracked_colors[arrangement] = ((1 << i) - 1, 1 << i,
+                                                         self._rank_weights[i] * self.orientations ** k,
+                                                         twist * self.orientations ** (k - 1 - i))
+        # Reads the colors of every slot straight from the stickers, slot after slot
+        self._read_slots = itemgetter(*facelets)
+
+    # Index of the abstract state of a tuple of 54 stickers. Slots are read in order, so the pieces already found are
+    # exactly those in smaller slots and each Lehmer digit is the slot minus the earlier tracked pieces found so far.
+    def index(self, stickers):
+        index = 0
+        found = 0
+        tracked_colors = self._tracked_colors
+        colors = iter(self._read_slots(stickers))
+        for s, slot_colors in enumerate(zip(*[colors] * self.orientations)):
+            entry = tracked_colors.get(slot_colors)
+            if entry is not None:
+                earlier, bit, weight, twist_term = entry
+                index += (s - (found & earlier).bit_count()) * weight + twist_term
+                found |= bit
+        return index
+
+    # Indices of the abstract states of an (N, 54) array of stickers
+    def index_batch(self, stickers):
+        stickers = np.asarray(stickers, dtype=np.int64)
+        facelets = np.empty((len(stickers), len(self.pieces)), dtype=np.int64)
+        position = {piece: i for i, piece in enumerate(self.pieces)}
+        for s, slot in enumerate(self.slots):
+            key = sum(stickers[:, p] * 6 ** i for i, p in enumerate(slot))
+            pieces = self._piece_table[key]
+            twists = self._twist_table[key]
+            for piece, i in position.items():
+                rows = pieces == piece
+                facelets[rows, i] = s * self.orientations + twists[rows]
+        return self.encode(facelets)
+
+    # Indices of the abstract states given as an (N, k) array of the facelets holding each tracked piece
+    def encode(self, facelets):
+        slots, twists = np.divmod(facelets, self.orientations)
+        rank = np.zeros(len(facelets), dtype=np.int64)
+        twist_number = np.zeros(len(facelets), dtype=np.int64)
+        for i, weight in enumerate(self._rank_weights):
+            smaller_taken = (slots[:, :i] < slots[:, i:i + 1]).sum(axis=1)
+            rank += (slots[:, i] - smaller_taken) * weight
+            twist_number = twist_number * self.orientations + twists[:, i]
+        return rank * self.orientations ** len(self.pieces) + twist_number
+
+    # Inverse of encode
+    def decode(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        k = len(self.pieces)
+        rank, twist_number = np.divmod(indices, self.orientations ** k)
+        twists = np.empty((len(indices), k), dtype=np.int64)
+        for i in reversed(range(k)):
+            twist_number, twists[:, i] = np.divmod(twist_number, self.orientations)
+
+        slots = np.empty((len(indices), k), dtype=np.int64)
+        taken = np.zeros((len(indices), len(self.slots)), dtype=bool)
+        for i, weight in enumerate(self._rank_weights):
+            digit, rank = np.divmod(rank, weight)
+            # The slot is the digit-th one not taken yet
+            free_before = np.cumsum(~taken, axis=1)
+            slots[:, i] = np.argmax((free_before == digit[:, None] + 1) & ~taken, axis=1)
+            taken[np.arange(len(indices)), slots[:, i]] = True
+        return slots * self.orientations + twists
+
+
+# Full corner abstraction; the eighth corner is implied by the other seven so only they are tracked
+def corner_abstraction():
+    return PieceAbstraction(CORNER_SLOTS, range(7))
+
+
+# Abstraction over a subset of the edges, by default six of the eleven edges the Rotation moves can reach
+def edge_abstraction(pieces=range(6)):
+    return PieceAbstraction(EDGE_SLOTS, pieces)
+
+
+# Breadth-first search from the solved cube over every Rotation, writing the distance of each abstract state into a
+# packed 4-bit table at path. Progress is kept next to the output after every completed depth, so an interrupted build
+# resumes from the last one. With processes > 1 each depth is expanded by a pool of workers sharing the partial table.
+def build_pattern_database(abstraction, path, processes=1):
+    partial_path = path + '.partial'
+    progress_path = path + '.progress'
+    if os.path.exists(partial_path) and os.path.exists(progress_path):
+        with open(progress_path) as f:
+            depth = int(f.read())
+        depths = np.memmap(partial_path, dtype=np.uint8, mode='r+', shape=(abstraction.size,))
+    else:
+        depths = np.memmap(partial_path, dtype=np.uint8, mode='w+', shape=(abstraction.size,))
+        depths[:] = _UNSEEN
+        depths[abstraction.index(DEFAULT_STICKERS)] = 0
+        depths.flush()
+        depth = 0
+        _write_progress(progress_path, depth)
+
+    tasks = [(abstraction, partial_path, start, min(start + BUILD_CHUNK, abstraction.size))
+             for start in range(0, abstraction.size, BUILD_CHUNK)]
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        while True:
+            layer = [task + (depth,) for task in tasks]
+            if pool is None:
+                expanded = sum(map(_expand_range, layer))
+            else:
+                expanded = sum(pool.imap_unordered(_expand_range, layer))
+            if not expanded:
+                break
+            depth += 1
+            _write_progress(progress_path, depth)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    _pack_table(depths, path)
+    del depths
+    os.remove(partial_path)
+    os.remove(progress_path)
+
+
+def _write_progress(progress_path, depth):
+    with open(progress_path, 'w') as f:
+        f.write(str(depth))
+
+
+# Expands the entries at the given depth within [start, stop) of the partial table, marking their unvisited neighbours
+# one deeper, and returns how many entries were expanded. Concurrent workers only ever write depth + 1 into unvisited
+# entries, so overlapping writes agree, and re-expanding a depth after an interruption is harmless.
+def _expand_range(task):
+    abstraction, partial_path, start, stop, depth = task
+    depths = np.memmap(partial_path, dtype=np.uint8, mode='r+', shape=(abstraction.size,))
+    frontier = start + np.flatnonzero(depths[start:stop] == depth)
+    if len(frontier):
+        facelets = abstraction.decode(frontier)
+        for table in abstraction.move_tables:
+            children = abstraction.encode(table[facelets])
+            depths[children[depths[children] == _UNSEEN]] = depth + 1
+        depths.flush()
+    return len(frontier)
+
+
+# Writes the byte-per-entry depths as 4-bit entries, low nibble first, replacing path atomically
+def _pack_table(depths, path):
+    temporary_path = path + '.tmp'
+    packed = np.memmap(temporary_path, dtype=np.uint8, mode='w+', shape=((len(depths) + 1) // 2,))
+    for start in range(0, len(depths), BUILD_CHUNK):
+        values = np.minimum(depths[start:start + BUILD_CHUNK], MAX_DISTANCE)
+        values[depths[start:start + BUILD_CHUNK] == _UNSEEN] = UNKNOWN
+        if len(values) % 2:
+            values = np.append(values, UNKNOWN)
+        packed[start // 2:start // 2 + len(values) // 2] = values[0::2] | values[1::2] << 4
+    packed.flush()
+    del packed
+    os.replace(temporary_path, path)
+
+
+# Read-only view of a packed pattern database. The file is memory mapped, so opening it is instant and every process
+# reading the same file shares one copy through the page cache.
+class PatternDatabase:
+
+    def __init__(self, abstraction, path):
+        self.abstraction = abstraction
+        # Plain views of the mapping, as indexing a memmap goes through its slower subclass machinery; the memoryview
+        # gives the fastest reads of single entries
+        self.table = np.memmap(path, dtype=np.uint8, mode='r').view(np.ndarray)
+        self._entries = memoryview(self.table)
+        if len(self.table) != (abstraction.size + 1) // 2:
+            raise ValueError("{0} does not hold {1} entries".format(path, abstraction.size))
+
+    # Distance to solved of the abstract state of a tuple of 54 stickers, a lower bound on the cube's own distance
+    def distance(self, stickers):
+        i = self.abstraction.index(stickers)
+        return self._entries[i >> 1] >> (i & 1) * 4 & 15
+
+    # Distances of an (N, 54) array of stickers
+    def distance_batch(self, stickers):
+        i = self.abstraction.index_batch(stickers)
+        return self.table[i >> 1] >> (i & 1) * 4 & 15
+
+    def lookup(self, cube):
+        return self.distance(cube.stickers)
+
+    # Lets the database be used directly as a heuristic over sticker tuples
+    def __call__(self, stickers):
+        distance = self.distance(stickers)
+        return 0 if distance == UNKNOWN else distance
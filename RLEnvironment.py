@@ -0,0 +1,174 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from Environment import Color, Rotation, RubiksCube, BatchedRubiksCube, DEFAULT_STICKERS, rotation_values
+
+# Discrete action space: the action with index i is the Rotation of value i
+ACTIONS = tuple(Rotation)
+# Observations are one-hot stickers, 6 colors for each of the 54 positions
+OBSERVATION_SIZE = 54 * len(Color)
+
+_IDENTITY = np.eye(len(Color), dtype=np.uint8)
+
+
+# One-hot observation of a tuple of 54 stickers
+def one_hot(stickers):
+    return _IDENTITY[list(stickers)].reshape(OBSERVATION_SIZE)
+
+
+# Writes the one-hot observations of an (N, 54) sticker array into an (N, OBSERVATION_SIZE) buffer
+def one_hot_batch(stickers, out):
+    np.equal(stickers[:, :, None], np.arange(len(Color), dtype=np.uint8),
+             out=out.reshape(len(stickers), 54, len(Color)))
+
+
+# Single cube environment with a reset()/step(action) interface. Each episode starts from scramble_depth random
+# rotations of the solved cube and ends when the cube is solved, giving a reward of 1, or after max_steps steps.
+class RubiksCubeEnv:
+
+    def __init__(self, scramble_depth=20, max_steps=100, seed=None):
+        self.scramble_depth = scramble_depth
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        self.cube = RubiksCube()
+        self.steps = 0
+
+    # Scrambles a fresh cube and returns its observation
+    def reset(self):
+        self.cube = RubiksCube()
+        for value in self.rng.integers(len(ACTIONS), size=self.scramble_depth).tolist():
+            self.cube.rotate(ACTIONS[value])
+        self.steps = 0
+        return one_hot(self.cube.stickers)
+
+    # Applies an action, given as a Rotation or its index, and returns (observation, reward, done, info)
+    def step(self, action):
+        if not isinstance(action, Rotation):
+            if not 0 <= action < len(ACTIONS):
+                raise ValueError("actions must be rotation values from 0 to {0}".format(len(ACTIONS) - 1))
+            action = ACTIONS[action]
+        self.cube.rotate(action)
+        self.steps += 1
+        solved = self.cube.stickers == DEFAULT_STICKERS
+        done = solved or self.steps >= self.max_steps
+        return one_hot(self.cube.stickers), 1.0 if solved else 0.0, done, {'steps': self.steps}
+
+
+# Many RubiksCubeEnv episodes stepped together by a pool of worker processes, each owning a contiguous shard of the
+# environments as a BatchedRubiksCube. Actions, observations, rewards and dones live in shared memory, so a step only
+# sends a short command to every worker and nothing is pickled. Finished environments are reset automatically, so the
+# observation returned for them is the first of their next episode.
+class VectorRubiksCubeEnv:
+
+    def __init__(self, num_envs, num_workers=None, scramble_depth=20, max_steps=100, seed=None):
+        self.num_envs = num_envs
+        num_workers = min(num_workers or os.cpu_count(), num_envs)
+
+        self._memory = []
+        self.actions = self._shared_array((num_envs,), np.int64)
+        self.observations = self._shared_array((num_envs, OBSERVATION_SIZE), np.uint8)
+        self.rewards = self._shared_array((num_envs,), np.float32)
+        self.dones = self._shared_array((num_envs,), np.bool_)
+
+        self._connections = []
+        self._workers = []
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        seeds = np.random.SeedSequence(seed).spawn(num_workers)
+        names = [memory.name for memory in self._memory]
+        for lo, hi, worker_seed in zip(bounds[:-1], bounds[1:], seeds):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_worker, daemon=True,
+                                             args=(worker_connection, names, num_envs, int(lo), int(hi),
+                                                   scramble_depth, max_steps, worker_seed))
+            worker.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def _shared_array(self, shape, dtype):
+        memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+        self._memory.append(memory)
+        return np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    # Scrambles every environment and returns the observations. The returned array is the shared buffer itself and is
+    # overwritten by the next call.
+    def reset(self):
+        self._run('reset')
+        return self.observations
+
+    # Applies one action per environment, given as Rotation or its index like RubiksCubeEnv.step, and returns
+    # (observations, rewards, dones, info) as views of the shared buffers
+    def step(self, actions):
+        self.actions[:] = rotation_values(actions)
+        self._run('step')
+        return self.observations, self.rewards, self.dones, {}
+
+    def _run(self, command):
+        for connection in self._connections:
+            connection.send(command)
+        for connection in self._connections:
+            connection.recv()
+
+    def close(self):
+        if not self._workers:
+            return
+        for connection in self._connections:
+            connection.send('close')
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self.actions = self.observations = self.rewards = self.dones = None
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+        self._memory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _worker(connection, names, num_envs, lo, hi, scramble_depth, max_steps, seed):
+    memory = [shared_memory.SharedMemory(name=name) for name in names]
+    actions = np.ndarray((num_envs,), dtype=np.int64, buffer=memory[0].buf)[lo:hi]
+    observations = np.ndarray((num_envs, OBSERVATION_SIZE), dtype=np.uint8, buffer=memory[1].buf)[lo:hi]
+    rewards = np.ndarray((num_envs,), dtype=np.float32, buffer=memory[2].buf)[lo:hi]
+    dones = np.ndarray((num_envs,), dtype=np.bool_, buffer=memory[3].buf)[lo:hi]
+
+    rng = np.random.default_rng(seed)
+    cubes = BatchedRubiksCube(hi - lo)
+    steps = np.zeros(hi - lo, dtype=np.int64)
+
+    def scramble(which):
+        cubes.reset(which)
+        steps[which] = 0
+        count = np.count_nonzero(which)
+        for _ in range(scramble_depth):
+            cubes.rotate(rng.integers(len(ACTIONS), size=count), which)
+
+    while True:
+        command = connection.recv()
+        if command == 'close':
+            break
+        if command == 'reset':
+            scramble(np.ones(hi - lo, dtype=bool))
+        elif command == 'step':
+            cubes.rotate(actions)
+            steps += 1
+            solved = cubes.is_solved()
+            rewards[:] = solved
+            dones[:] = solved | (steps >= max_steps)
+            if dones.any():
+                scramble(dones.copy())
+        one_hot_batch(cubes.stickers, observations)
+        connection.send(None)
+
+    del actions, observations, rewards, dones
+    for m in memory:
+        m.close()
+    connection.close()
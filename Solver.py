@@ -0,0 +1,191 @@
+from time import perf_counter
+
+from Environment import Rotation, MOVE_GETTERS, DEFAULT_STICKERS
+
+# Rotations are numbered two per face, base turn then prime
+_FACE = {r: r.value // 2 for r in Rotation}
+_INVERSE = {r: Rotation(r.value ^ 1) for r in Rotation}
+# LEFT and RIGHT turn opposite faces and commute, so only the order LEFT then RIGHT is searched
+_COMMUTING_AFTER = {_FACE[Rotation.RIGHT]: _FACE[Rotation.LEFT]}
+
+# Number of nodes expanded between two checks of the time budget
+_TIME_CHECK_INTERVAL = 1024
+
+
+# Whether a rotation may follow the last two rotations of a path. As every Rotation is a quarter turn, a base turn may
+# be repeated once to make a half turn, but a move is never followed by its inverse, a prime is never repeated (X' X'
+# is X X) and no face is turned three times in a row (X X X is X').
+def _is_useful(second_last, last, rotation):
+    if last is None:
+        return True
+    if rotation is _INVERSE[last]:
+        return False
+    if rotation is last and (rotation is second_last or rotation.value & 1):
+        return False
+    return _COMMUTING_AFTER.get(_FACE[last]) != _FACE[rotation]
+
+
+# Rotations worth trying after every pair of last two rotations, None standing for the start of the path
+_SUCCESSORS = {(a, b): tuple(r for r in Rotation if _is_useful(a, b, r))
+               for a in (None,) + tuple(Rotation) for b in (None,) + tuple(Rotation)}
+
+
+def zero_heuristic(stickers):
+    return 0
+
+
+# Heuristic taking the largest of several admissible heuristics, e.g. a corner and an edge pattern database
+def max_heuristic(*heuristics):
+    def heuristic(stickers):
+        return max(h(stickers) for h in heuristics)
+    return heuristic
+
+
+# Outcome of a search: the rotations solving the cube, or None when no solution was found within the budget or depth,
+# along with how much work it took
+class SolverResult:
+
+    def __init__(self, solution, nodes, seconds):
+        self.solution = solution
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return "SolverResult(solution={0}, nodes={1}, seconds={2:.3f})".format(self.solution, self.nodes, self.seconds)
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+# Solves a RubiksCube over the Rotation moves. The heuristic is any callable mapping a tuple of 54 stickers to a lower
+# bound on the number of moves left (a PatternDatabase, max_heuristic over several, or a learned value function, in
+# which case solutions are no longer guaranteed optimal). node_limit and time_limit bound each solve; when either runs
+# out the result carries no solution.
+class Solver:
+
+    def __init__(self, heuristic=zero_heuristic, node_limit=None, time_limit=None):
+        self.heuristic = heuristic
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+
+    # Iterative-deepening A*, optimal whenever the heuristic is admissible
+    def solve(self, cube, max_depth=26):
+        heuristic = self.heuristic
+        successors = _SUCCESSORS
+        moves = MOVE_GETTERS
+        solved = DEFAULT_STICKERS
+        path = []
+        nodes = 0
+        node_limit = self._node_limit()
+        next_check = _TIME_CHECK_INTERVAL
+        start = perf_counter()
+
+        # Returns None once solved, otherwise the smallest f above the bound seen below this node
+        def search(stickers, g, bound, second_last, last):
+            nonlocal nodes, next_check
+            f = g + heuristic(stickers)
+            if f > bound:
+                return f
+            if stickers == solved:
+                return None
+            if nodes >= node_limit:
+                raise _BudgetExhausted
+            nodes += 1
+            if nodes >= next_check:
+                self._check_time(start)
+                next_check = nodes + _TIME_CHECK_INTERVAL
+            minimum = max_depth + 1
+            for r in successors[second_last, last]:
+                path.append(r)
+                t = search(moves[r.value](stickers), g + 1, bound, last, r)
+                if t is None:
+                    return None
+                path.pop()
+                if t < minimum:
+                    minimum = t
+            return minimum
+
+        bound = heuristic(cube.stickers)
+        try:
+            while bound <= max_depth:
+                t = search(cube.stickers, 0, bound, None, None)
+                if t is None:
+                    return SolverResult(path, nodes, perf_counter() - start)
+                bound = t
+        except _BudgetExhausted:
+            pass
+        return SolverResult(None, nodes, perf_counter() - start)
+
+    # Breadth-first search from the cube and from the solved configuration at once, always growing the smaller frontier.
+    # Optimal and heuristic-free; practical for short scrambles as memory grows with the frontiers.
+    def solve_bidirectional(self, cube, max_depth=14):
+        start = perf_counter()
+        nodes = 0
+        node_limit = self._node_limit()
+        # Each side maps the bytes of a reached state to the bytes of the state it was reached from and the rotation
+        # leading from the cube side toward the solved side between them. Bytes take a fraction of the memory of sticker
+        # tuples, which are only kept in the frontiers to apply moves.
+        forward = {bytes(cube.stickers): None}
+        backward = {bytes(DEFAULT_STICKERS): None}
+        forward_frontier = [cube.stickers]
+        backward_frontier = [DEFAULT_STICKERS]
+        depth = 0
+        meeting = bytes(cube.stickers) if bytes(cube.stickers) in backward else None
+
+        try:
+            while meeting is None and depth < max_depth and forward_frontier and backward_frontier:
+                grow_forward = len(forward_frontier) <= len(backward_frontier)
+                frontier, seen, other = (forward_frontier, forward, backward) if grow_forward \
+                    else (backward_frontier, backward, forward)
+                next_frontier = []
+                for stickers in frontier:
+                    if nodes >= node_limit:
+                        raise _BudgetExhausted
+                    nodes += 1
+                    if nodes % _TIME_CHECK_INTERVAL == 0:
+                        self._check_time(start)
+                    key = bytes(stickers)
+                    for r in Rotation:
+                        child = MOVE_GETTERS[(r if grow_forward else _INVERSE[r]).value](stickers)
+                        child_key = bytes(child)
+                        if child_key not in seen:
+                            seen[child_key] = (key, r)
+                            next_frontier.append(child)
+                            if meeting is None and child_key in other:
+                                meeting = child_key
+                if grow_forward:
+                    forward_frontier = next_frontier
+                else:
+                    backward_frontier = next_frontier
+                depth += 1
+        except _BudgetExhausted:
+            return SolverResult(None, nodes, perf_counter() - start)
+
+        if meeting is None:
+            return SolverResult(None, nodes, perf_counter() - start)
+        solution = []
+        key = meeting
+        while forward[key] is not None:
+            key, r = forward[key]
+            solution.append(r)
+        solution.reverse()
+        key = meeting
+        while backward[key] is not None:
+            key, r = backward[key]
+            solution.append(r)
+        return SolverResult(solution, nodes, perf_counter() - start)
+
+    # Number of nodes a solve may expand; checked on every expansion as it costs one comparison
+    def _node_limit(self):
+        return float('inf') if self.node_limit is None else self.node_limit
+
+    # Reading the clock costs more than expanding a node, so the time budget is only checked every
+    # _TIME_CHECK_INTERVAL expansions
+    def _check_time(self, start):
+        if self.time_limit is not None and perf_counter() - start >= self.time_limit:
+            raise _BudgetExhausted
@@ -0,0 +1,153 @@
+from itertools import permutations
+from operator import itemgetter
+
+from Environment import Color, Rotation, MOVE_TABLE, CubeState
+
+# Faces are numbered by the color of their center, which is the color value of their 9 bitboard positions
+_OPPOSITE = {Color.RED.value: Color.ORANGE.value, Color.ORANGE.value: Color.RED.value,
+             Color.GREEN.value: Color.BLUE.value, Color.BLUE.value: Color.GREEN.value,
+             Color.YELLOW.value: Color.WHITE.value, Color.WHITE.value: Color.YELLOW.value}
+_BASE_ROTATIONS = (Rotation.UP, Rotation.LEFT, Rotation.FRONT, Rotation.RIGHT)
+# Position each sticker moves to under every rotation
+_DESTINATION = {r: {source: target for target, source in enumerate(MOVE_TABLE[r])} for r in Rotation}
+
+
+def _face(position):
+    return position // 9
+
+
+# Face whose 9 stickers a base rotation turns in place
+def _turned_face(rotation):
+    return next(f for f in range(len(Color)) if MOVE_TABLE[rotation][f * 9 + 4] == f * 9 + 4
+                and all(_face(MOVE_TABLE[rotation][f * 9 + i]) == f for i in range(9))
+                and any(MOVE_TABLE[rotation][f * 9 + i] != f * 9 + i for i in range(9)))
+
+
+_ROTATION_OF_FACE = {_turned_face(r): r for r in _BASE_ROTATIONS}
+
+
+# Whole-cube rotation or reflection under which the Rotation move set is closed. Applying it to a state relabels colors
+# along with positions, so the solved cube maps to itself and distances to solved are preserved; a rotation r applied to
+# a state corresponds to actions[r] applied to the transformed state.
+class Symmetry:
+
+    def __init__(self, positions, faces, actions):
+        # positions[p] is where the sticker at p goes, faces[f] where face f goes
+        self.positions = positions
+        self.faces = faces
+        self.actions = actions
+        self.inverse_actions = {b: a for a, b in actions.items()}
+        sources = [0] * 54
+        for p, q in enumerate(positions):
+            sources[q] = p
+        self._gather = itemgetter(*sources)
+        self._colors = bytes.maketrans(bytes(range(len(Color))), bytes(faces))
+
+    # Transformed state of a tuple or bytes of 54 stickers, as bytes
+    def apply(self, stickers):
+        return bytes(self._gather(bytes(stickers).translate(self._colors)))
+
+    def __repr__(self):
+        return "Symmetry(faces={0})".format(self.faces)
+
+
+# Tries to build the symmetry moving faces as given, reflecting the cube when mirror is set. Stickers moved by some
+# rotation are matched orbit by orbit so that every rotation r is carried onto actions[r]; stickers no rotation moves
+# are matched by face. Returns None when no such symmetry exists.
+def _build_symmetry(faces, mirror):
+    actions = {}
+    for r in _BASE_ROTATIONS:
+        image = _ROTATION_OF_FACE.get(faces[_turned_face(r)])
+        if image is None:
+            return None
+        prime = Rotation(image.value | 1)
+        actions[r] = prime if mirror else image
+        actions[Rotation(r.value | 1)] = image if mirror else prime
+
+    positions = {}
+    fixed = [p for p in range(54) if all(MOVE_TABLE[r][p] == p for r in _BASE_ROTATIONS)]
+    for p in fixed:
+        candidates = [q for q in fixed if _face(q) == faces[_face(p)] and (q % 9 == 4) == (p % 9 == 4)]
+        if len(candidates) != 1:
+            return None
+        positions[p] = candidates[0]
+
+    for p in range(54):
+        if p in positions:
+            continue
+        for q in range(54):
+            if q in positions.values() or _face(q) != faces[_face(p)]:
+                continue
+            matched = _match_orbit(p, q, faces, actions, positions)
+            if matched is not None:
+                positions.update(matched)
+                break
+        else:
+            return None
+
+    if sorted(positions.values()) != list(range(54)):
+        return None
+    return Symmetry(tuple(positions[p] for p in range(54)), tuple(faces), actions)
+
+
+# Extends p -> q along the orbit of p so that every rotation commutes with the symmetry, or returns None on a conflict
+def _match_orbit(p, q, faces, actions, assigned):
+    matched = {p: q}
+    stack = [p]
+    while stack:
+        x = stack.pop()
+        for r in _BASE_ROTATIONS:
+            x_next = _DESTINATION[r][x]
+            y_next = _DESTINATION[actions[r]][matched[x]]
+            if x_next in matched:
+                if matched[x_next] != y_next:
+                    return None
+            elif x_next in assigned or _face(y_next) != faces[_face(x_next)]:
+                return None
+            else:
+                matched[x_next] = y_next
+                stack.append(x_next)
+    return matched
+
+
+# Every symmetry of the cube under which the move set is closed, the identity first. Of the 48 symmetries of the cube
+# only those mapping the turned faces UP, LEFT, FRONT and RIGHT onto themselves qualify.
+def _find_symmetries():
+    symmetries = []
+    for mirror in (False, True):
+        for moving in permutations(sorted(_ROTATION_OF_FACE)):
+            faces = [None] * len(Color)
+            for f, g in zip(sorted(_ROTATION_OF_FACE), moving):
+                faces[f] = g
+                if _OPPOSITE[f] not in _ROTATION_OF_FACE:
+                    faces[_OPPOSITE[f]] = _OPPOSITE[g]
+            if sorted(f for f in faces if f is not None) != list(range(len(Color))):
+                continue
+            symmetry = _build_symmetry(faces, mirror)
+            if symmetry is not None:
+                symmetries.append(symmetry)
+    return tuple(symmetries)
+
+
+SYMMETRIES = _find_symmetries()
+
+
+# Canonical representative of the symmetry class of a tuple or bytes of 54 stickers, as bytes: the smallest of its
+# transformed states
+def canonical_key(stickers):
+    key = bytes(stickers)
+    return min(symmetry.apply(key) for symmetry in SYMMETRIES)
+
+
+# Canonical CubeState of a tuple of 54 stickers, along with the symmetry mapping the state onto it; actions taken in
+# the original frame map to the canonical frame through symmetry.actions and back through symmetry.inverse_actions
+def canonicalize(stickers):
+    key = bytes(stickers)
+    best = None
+    best_symmetry = None
+    for symmetry in SYMMETRIES:
+        transformed = symmetry.apply(key)
+        if best is None or transformed < best:
+            best = transformed
+            best_symmetry = symmetry
+    return CubeState(best), best_symmetry
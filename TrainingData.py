@@ -0,0 +1,100 @@
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from Environment import Rotation, BatchedRubiksCube
+
+# Fixed-size record of one scrambled state: the 54 stickers packed 3 bits each into 21 bytes, the number of random
+# rotations applied to the solved cube to reach it and the value of the last of them
+PACKED_STICKERS_SIZE = 21
+RECORD_DTYPE = np.dtype([('stickers', np.uint8, PACKED_STICKERS_SIZE), ('depth', np.uint8), ('last_move', np.uint8)])
+
+# Number of records generated per chunk
+CHUNK_SIZE = 1 << 16
+
+# Stickers are packed 8 at a time into 24-bit little-endian groups
+_SHIFTS = np.arange(8, dtype=np.uint32) * 3
+
+
+# Packs an (N, 54) array of stickers into an (N, 21) array of bytes
+def pack_stickers(stickers):
+    stickers = np.asarray(stickers)
+    padded = np.zeros((len(stickers), 56), dtype=np.uint32)
+    padded[:, :54] = stickers
+    groups = (padded.reshape(-1, 7, 8) << _SHIFTS).sum(axis=2, dtype=np.uint32)
+    return groups.astype('<u4').view(np.uint8).reshape(-1, 7, 4)[:, :, :3].reshape(-1, PACKED_STICKERS_SIZE)
+
+
+# Unpacks an (N, 21) array of bytes into an (N, 54) array of stickers
+def unpack_stickers(packed):
+    packed = np.asarray(packed).reshape(-1, 7, 3).astype(np.uint32)
+    groups = packed[:, :, 0] | packed[:, :, 1] << 8 | packed[:, :, 2] << 16
+    return ((groups[:, :, None] >> _SHIFTS) & 7).reshape(-1, 56)[:, :54].astype(np.uint8)
+
+
+# Yields count records in chunks of at most chunk_size. Records come from random walks of max_depth rotations from the
+# solved cube, every intermediate state giving one record. Records are laid out walk by walk and only the last walk is
+# cut short when count is not a multiple of max_depth, so depths from 1 to max_depth are equally represented up to one
+# record each, and only the shallowest count depths appear when count < max_depth. The records only depend on count,
+# max_depth and seed: chunk_size merely sets how many walks are generated at once.
+def generate_records(count, max_depth, seed=None, chunk_size=CHUNK_SIZE):
+    rng = np.random.default_rng(seed)
+    walks = max(1, chunk_size // max_depth)
+    while count > 0:
+        records = _random_walks(rng, min(walks, -(-count // max_depth)), max_depth)[:count]
+        count -= len(records)
+        # A single walk is longer than a chunk when max_depth > chunk_size
+        for start in range(0, len(records), chunk_size):
+            yield records[start:start + chunk_size]
+
+
+# Records of every state along the given number of random walks, one walk after the other from depth 1 to max_depth.
+# Every move takes one raw 64-bit draw, walk after walk, so successive calls continue the same stream of walks however
+# many walks each one generates; 2 ** 64 being a multiple of len(Rotation), moves stay uniform.
+def _random_walks(rng, walks, max_depth):
+    cubes = BatchedRubiksCube(walks)
+    records = np.empty(walks * max_depth, dtype=RECORD_DTYPE)
+    moves = (rng.bit_generator.random_raw((walks, max_depth)) % len(Rotation)).astype(np.intp)
+    for depth in range(1, max_depth + 1):
+        cubes.rotate(moves[:, depth - 1])
+        rows = slice(depth - 1, None, max_depth)
+        records['stickers'][rows] = pack_stickers(cubes.stickers)
+        records['depth'][rows] = depth
+        records['last_move'][rows] = moves[:, depth - 1]
+    return records
+
+
+# Streams count records to a file of RECORD_DTYPE records. With processes > 1 each worker fills its own contiguous
+# range of the file from its own seed derived from seed, so besides count and max_depth the output only depends on seed
+# and processes, not on chunk_size.
+def write_records(path, count, max_depth, seed=None, processes=1, chunk_size=CHUNK_SIZE):
+    with open(path, 'wb') as f:
+        f.truncate(count * RECORD_DTYPE.itemsize)
+    bounds = np.linspace(0, count, processes + 1).astype(int)
+    seeds = np.random.SeedSequence(seed).spawn(processes)
+    tasks = [(path, count, int(lo), int(hi), max_depth, worker_seed, chunk_size)
+             for lo, hi, worker_seed in zip(bounds[:-1], bounds[1:], seeds)]
+    if processes > 1:
+        with Pool(processes) as pool:
+            pool.map(_write_range, tasks)
+    else:
+        _write_range(tasks[0])
+
+
+def _write_range(task):
+    path, count, lo, hi, max_depth, seed, chunk_size = task
+    if lo == hi:
+        return
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode='r+', shape=(count,))
+    for chunk in generate_records(hi - lo, max_depth, seed, chunk_size):
+        records[lo:lo + len(chunk)] = chunk
+        lo += len(chunk)
+    records.flush()
+
+
+# Opens a file written by write_records without loading it; unpack the 'stickers' field of any slice to get stickers
+def read_records(path):
+    if os.path.getsize(path) % RECORD_DTYPE.itemsize:
+        raise ValueError("{0} is not a whole number of records".format(path))
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r')
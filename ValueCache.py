@@ -0,0 +1,174 @@
+import numpy as np
+
+from Environment import Rotation, CubeState
+
+_EMPTY = -1
+# Bytes per bucket of the index
+_INDEX_ITEM_SIZE = 8
+
+
+# Fixed-size cache from cube states to one value per Rotation, e.g. Q-values or visit counts. Entries live in arrays
+# allocated up front and are found through an open-addressing (linear probing) index; once full, the least recently
+# used entries are evicted with the clock algorithm. States are tuples of 54 stickers or CubeState.
+class ValueCache:
+
+    def __init__(self, capacity=None, max_bytes=None, dtype=np.float32):
+        if capacity is None:
+            if max_bytes is None:
+                raise ValueError("capacity or max_bytes is required")
+            capacity = self.capacity_for(max_bytes, dtype)
+        if capacity < 1:
+            raise ValueError("the cache must hold at least one entry")
+        self.capacity = capacity
+        self.keys = np.zeros((capacity, 54), dtype=np.uint8)
+        self.hashes = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, len(Rotation)), dtype=dtype)
+        self.referenced = np.zeros(capacity, dtype=bool)
+        # Bucket of the index holding each entry, to remove it on eviction
+        self.buckets = np.zeros(capacity, dtype=np.int64)
+        self.index = np.full(_index_size(capacity), _EMPTY, dtype=np.int64)
+        self._mask = len(self.index) - 1
+        self.size = 0
+        self._hand = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Bytes used per entry outside the index
+    @staticmethod
+    def entry_size(dtype=np.float32):
+        return 54 + 8 + len(Rotation) * np.dtype(dtype).itemsize + 1 + 8
+
+    # Bytes allocated by a cache of the given capacity, index included
+    @staticmethod
+    def memory_size(capacity, dtype=np.float32):
+        return capacity * ValueCache.entry_size(dtype) + _index_size(capacity) * _INDEX_ITEM_SIZE
+
+    # Largest capacity of a cache allocating at most max_bytes. The index is a power of two, so for each index size
+    # the capacity is bounded both by half the index and by the bytes left for entries once the index is paid for.
+    @staticmethod
+    def capacity_for(max_bytes, dtype=np.float32):
+        capacity = 0
+        index_size = 2
+        while index_size * _INDEX_ITEM_SIZE < max_bytes:
+            entries = (max_bytes - index_size * _INDEX_ITEM_SIZE) // ValueCache.entry_size(dtype)
+            capacity = max(capacity, min(index_size // 2, entries))
+            index_size *= 2
+        return capacity
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, state):
+        key, h = _key(state)
+        return self._find(key, h)[1] != _EMPTY
+
+    # Values stored for a state, or None when it is not cached. The returned row is a view into the cache and may be
+    # changed in place; copy it to keep it past later insertions, which can evict it.
+    def get(self, state):
+        key, h = _key(state)
+        entry = self._find(key, h)[1]
+        if entry == _EMPTY:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.referenced[entry] = True
+        return self.values[entry]
+
+    # Stores the values of a state, replacing any cached ones. Not counted as a lookup in the hit and miss statistics.
+    def put(self, state, values):
+        key, h = _key(state)
+        entry = self._find(key, h)[1]
+        if entry == _EMPTY:
+            entry = self._insert(key, h)
+        self.values[entry] = values
+        self.referenced[entry] = True
+
+    # Row of values of a state, inserting a row of zeros when it is not cached; convenient for visit counts. Counted as
+    # a lookup like get, a hit when the state is cached and a miss when it is inserted.
+    def row(self, state):
+        key, h = _key(state)
+        entry = self._find(key, h)[1]
+        if entry != _EMPTY:
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry = self._insert(key, h)
+            self.values[entry] = 0
+        self.referenced[entry] = True
+        return self.values[entry]
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'size': self.size, 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hit_rate}
+
+    # Returns the bucket holding the key and its entry, or the empty bucket ending its probe sequence and _EMPTY
+    def _find(self, key, h):
+        index = self.index
+        bucket = h & self._mask
+        while True:
+            entry = int(index[bucket])
+            if entry == _EMPTY or (self.hashes[entry] == h and self.keys[entry].tobytes() == key):
+                return bucket, entry
+            bucket = (bucket + 1) & self._mask
+
+    # Stores a key missing from the cache and returns its entry, whose values are left as they were
+    def _insert(self, key, h):
+        entry = self._allocate()
+        # The eviction may have shifted the probe sequence, so look for a free bucket again
+        bucket = self._find(key, h)[0]
+        self.index[bucket] = entry
+        self.buckets[entry] = bucket
+        self.keys[entry] = np.frombuffer(key, dtype=np.uint8)
+        self.hashes[entry] = h
+        return entry
+
+    # Returns a free entry, evicting one with the clock algorithm when the cache is full
+    def _allocate(self):
+        if self.size < self.capacity:
+            self.size += 1
+            return self.size - 1
+        referenced = self.referenced
+        while referenced[self._hand]:
+            referenced[self._hand] = False
+            self._hand = (self._hand + 1) % self.capacity
+        entry = self._hand
+        self._hand = (self._hand + 1) % self.capacity
+        self._remove_bucket(int(self.buckets[entry]))
+        self.evictions += 1
+        return entry
+
+    # Empties a bucket of the index, shifting back later entries of the probe sequence so none becomes unreachable
+    def _remove_bucket(self, hole):
+        index = self.index
+        mask = self._mask
+        bucket = hole
+        while True:
+            bucket = (bucket + 1) & mask
+            entry = int(index[bucket])
+            if entry == _EMPTY:
+                break
+            home = int(self.hashes[entry]) & mask
+            # The entry may move into the hole unless its home lies cyclically within (hole, bucket]
+            if (bucket - home) & mask >= (bucket - hole) & mask:
+                index[hole] = entry
+                self.buckets[entry] = hole
+                hole = bucket
+        index[hole] = _EMPTY
+
+
+# Buckets of the index of a cache holding capacity entries, kept at most half full so probe sequences stay short
+def _index_size(capacity):
+    return 1 << (2 * capacity - 1).bit_length()
+
+
+def _key(state):
+    if isinstance(state, CubeState):
+        return state.key, hash(state)
+    key = bytes(state)
+    return key, hash(key)
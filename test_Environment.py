@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from Environment import Rotation, RubiksCube, BatchedRubiksCube, default_rubiks_cube
+
+# Bitboards after each rotation of the solved cube and after a longer sequence, as produced by the original bitboard
+# implementation of the rotate_* methods
+EXPECTED_AFTER_ROTATION = {
+    Rotation.UP: (60129542207, 32704, 16744448, 8573157376, 35115652612096, 17979214137393152),
+    Rotation.UP_PRIME: (229439, 117472768, 60146057216, 8455717312, 35115652612096, 17979214137393152),
+    Rotation.LEFT: (10273836649939163, 261632, 20066202025984, 68585259008, 15049565405476, 7705377506590720),
+    Rotation.LEFT_PRIME: (20066087207131, 261632, 10273836764758016, 68585259008, 15049584541696, 7705377487454500),
+    Rotation.FRONT: (511, 15762598695908864, 133955584, 539823702016, 34634616424448, 2216625239490560),
+    Rotation.FRONT_PRIME: (511, 481036449280, 133955584, 15762657483161600, 34644414169088, 2216615441745920),
+    Rotation.RIGHT: (5016521802166, 261632, 2568459219894272, 68585259008, 30099207356416, 15410754974908489),
+    Rotation.RIGHT_PRIME: (2568459162485174, 261632, 5016579211264, 68585259008, 30099130810441, 15410755051454464),
+}
+SEQUENCE = ('rotate_left', 'rotate_up', 'rotate_up', 'rotate_right', 'rotate_front', 'rotate_left_prime',
+            'rotate_up_prime', 'rotate_right_prime', 'rotate_up_prime', 'rotate_left_prime', 'rotate_front_prime')
+EXPECTED_AFTER_SEQUENCE = (3023793291825, 2251873097674752, 307863336386560, 13651590091112832, 1131545104485376,
+                           668503086530638)
+
+
+def test_default_cube():
+    assert RubiksCube().squares == tuple(default_rubiks_cube())
+
+
+def test_single_rotations():
+    for rotation, expected in EXPECTED_AFTER_ROTATION.items():
+        cube = RubiksCube()
+        getattr(cube, 'rotate_' + rotation.name.lower())()
+        assert cube.squares == expected, rotation
+
+
+def test_rotation_sequence():
+    cube = RubiksCube()
+    for name in SEQUENCE:
+        getattr(cube, name)()
+    assert cube.squares == EXPECTED_AFTER_SEQUENCE
+
+
+def test_squares_round_trip():
+    cube = RubiksCube()
+    cube.squares = EXPECTED_AFTER_SEQUENCE
+    assert cube.squares == EXPECTED_AFTER_SEQUENCE
+
+
+def test_batched_rotation_actions():
+    batch = BatchedRubiksCube(len(Rotation))
+    batch.rotate(np.array(list(Rotation)))
+    for rotation in Rotation:
+        assert batch.cube(rotation.value).squares == EXPECTED_AFTER_ROTATION[rotation], rotation
+
+
+def test_batched_rotation_rejects_invalid_actions():
+    batch = BatchedRubiksCube(3)
+    for actions in (np.array([8, 9, -1]), [0, 1, len(Rotation)], np.array([0.0, 1.0, 2.0])):
+        with pytest.raises(ValueError):
+            batch.rotate(actions)
+    assert batch.is_solved().all()
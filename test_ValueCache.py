@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+
+from Environment import Rotation, RubiksCube
+from ValueCache import ValueCache, _EMPTY
+
+
+# Distinct states along a random walk from the solved cube
+def random_states(count, seed=0):
+    rng = random.Random(seed)
+    cube = RubiksCube()
+    states = {}
+    while len(states) < count:
+        cube.rotate(rng.choice(list(Rotation)))
+        states[cube.stickers] = None
+    return list(states)
+
+
+def test_eviction_keeps_resident_entries_reachable():
+    # A small index makes probe sequences collide, so evictions exercise the backward shift of later entries
+    cache = ValueCache(8)
+    states = random_states(200)
+    stored = {}
+    for i, state in enumerate(states):
+        cache.put(state, np.full(len(Rotation), i))
+        stored[bytes(state)] = i
+        if i % 3 == 0:
+            cache.get(states[i // 2])
+
+        assert len(cache) == min(i + 1, cache.capacity)
+        occupied = cache.index[cache.index != _EMPTY]
+        assert len(occupied) == len(cache)
+        assert sorted(occupied.tolist()) == list(range(len(cache)))
+        for entry in range(len(cache)):
+            key = cache.keys[entry].tobytes()
+            assert cache.index[cache.buckets[entry]] == entry
+            assert key in cache
+            assert cache.values[entry][0] == stored[key]
+    assert cache.evictions == len(states) - cache.capacity
+    resident = {cache.keys[entry].tobytes() for entry in range(len(cache))}
+    assert sum(state in cache for state in states) == len(resident)
+
+
+def test_stats_count_lookups_only():
+    cache = ValueCache(4)
+    state = RubiksCube().state()
+    assert cache.get(state) is None
+    cache.put(state, range(len(Rotation)))
+    assert list(cache.get(state)) == list(range(len(Rotation)))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_max_bytes_is_a_cap():
+    for max_bytes in (200, 10 ** 4, 10 ** 6):
+        cache = ValueCache(max_bytes=max_bytes)
+        allocated = sum(a.nbytes for a in (cache.keys, cache.hashes, cache.values, cache.referenced, cache.buckets,
+                                           cache.index))
+        assert allocated == ValueCache.memory_size(cache.capacity) <= max_bytes
+        assert ValueCache.memory_size(cache.capacity + 1) > max_bytes